@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
+import html
 import os
 import warnings
 import logging
-from llm.handler import LLMHandler
-from inventory.filters import ProductFilter, generate_recommendation_explanation
+from collections import OrderedDict
+from llm.handler import get_llm_handler
+from inventory.filters import get_product_filter, generate_recommendation_explanation
 
 # Comprehensive warning suppression
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -17,6 +19,9 @@ logging.getLogger("streamlit").setLevel(logging.ERROR)
 # Set environment variable to suppress warnings
 os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning'
 
+# Number of product cards rendered per results page
+PAGE_SIZE = 10
+
 # Page configuration
 st.set_page_config(
     page_title="Saleseer AI Product Recommendations",
@@ -29,6 +34,8 @@ st.set_page_config(
 st.markdown("""
 <style>
     .product-card {
+        display: flex;
+        gap: 20px;
         border: 1px solid #ddd;
         border-radius: 10px;
         padding: 15px;
@@ -36,11 +43,15 @@ st.markdown("""
         background-color: #f9f9f9;
     }
     .product-image {
-        width: 100%;
+        flex: 0 0 33%;
+        width: 33%;
         height: 200px;
         object-fit: cover;
         border-radius: 8px;
     }
+    .product-details {
+        flex: 1;
+    }
     .price-tag {
         font-size: 1.2em;
         font-weight: bold;
@@ -86,31 +97,37 @@ st.markdown("""
 def init_session_state():
     """Initialize session state variables."""
     if 'search_history' not in st.session_state:
-        st.session_state.search_history = []
+        st.session_state.search_history = OrderedDict()
     if 'last_results' not in st.session_state:
         st.session_state.last_results = None
+    if 'page' not in st.session_state:
+        st.session_state.page = 0
+
+def change_page(step):
+    """Move the results pager forward or back by step pages."""
+    st.session_state.page += step
 
 def display_product_card(product_row):
     """Display a single product in a card format."""
-    with st.container():
-        col1, col2 = st.columns([1, 2])
-        
-        with col1:
-            st.image(product_row['image_url'], use_container_width=True)
-        
-        with col2:
-            st.subheader(product_row['name'])
-            st.markdown(f"**Category:** {product_row['category'].title()}")
-            st.markdown(f"**Color:** {product_row['color'].title()}")
-            st.markdown(f"<span class='price-tag'>${product_row['price']:.2f}</span>", unsafe_allow_html=True)
-            
-            # Rating with stars
-            stars = "⭐" * int(product_row['rating'])
-            st.markdown(f"<span class='rating'>{stars} ({product_row['rating']}/5)</span>", unsafe_allow_html=True)
-            
-            st.markdown(f"*{product_row['description']}*")
-        
-        st.markdown("---")
+    # Rating with stars
+    stars = "⭐" * int(product_row['rating'])
+    
+    # The whole card is one markdown element; the browser fetches the image
+    # itself, deferring it until the card scrolls into view
+    st.markdown(
+        f"<div class='product-card'>"
+        f"<img class='product-image' src='{html.escape(product_row['image_url'])}' "
+        f"alt='{html.escape(product_row['name'])}' loading='lazy' decoding='async'>"
+        f"<div class='product-details'>"
+        f"<h3>{html.escape(product_row['name'])}</h3>"
+        f"<p><strong>Category:</strong> {html.escape(product_row['category'].title())}<br>"
+        f"<strong>Color:</strong> {html.escape(product_row['color'].title())}</p>"
+        f"<p><span class='price-tag'>${product_row['price']:.2f}</span><br>"
+        f"<span class='rating'>{stars} ({product_row['rating']}/5)</span></p>"
+        f"<p><em>{html.escape(product_row['description'])}</em></p>"
+        f"</div></div>",
+        unsafe_allow_html=True
+    )
 
 def main():
     # Initialize session state
@@ -129,8 +146,8 @@ def main():
     
     # Initialize components
     try:
-        llm_handler = LLMHandler()
-        product_filter = ProductFilter()
+        llm_handler = get_llm_handler()
+        product_filter = get_product_filter()
     except Exception as e:
         st.error(f"Error initializing components: {e}")
         return
@@ -158,54 +175,61 @@ def main():
     # Main search interface
     st.header("🔍 Search Products")
     
-    # Search input
-    user_query = st.text_input(
-        "What are you looking for?",
-        placeholder="e.g., Show me red dresses under $200",
-        help="Describe what you're looking for in natural language"
-    )
+    # Search form; the search only runs on an explicit submit, not on every
+    # rerun triggered by typing or by other widgets
+    with st.form("search_form"):
+        user_query = st.text_input(
+            "What are you looking for?",
+            placeholder="e.g., Show me red dresses under $200",
+            help="Describe what you're looking for in natural language"
+        )
+        submitted = st.form_submit_button("🔍 Search", type="primary")
     
-    # Search button
-    if st.button("🔍 Search", type="primary") or user_query:
-        if user_query.strip():
-            with st.spinner("🤖 Understanding your request and finding products..."):
-                try:
-                    # Parse the query using LLM
-                    criteria = llm_handler.parse_query(user_query)
-                    
-                    # Generate search summary
-                    search_summary = llm_handler.generate_search_summary(criteria, user_query)
-                    st.markdown(f"""
-                    <div class='search-summary'>
-                        <strong>🎯 {search_summary}</strong>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Filter products
-                    filtered_products = product_filter.filter_products(criteria)
-                    
-                    # Store results in session state
-                    st.session_state.last_results = {
-                        'query': user_query,
-                        'criteria': criteria,
-                        'products': filtered_products
-                    }
-                    
-                    # Add to search history
-                    if user_query not in st.session_state.search_history:
-                        st.session_state.search_history.insert(0, user_query)
-                        if len(st.session_state.search_history) > 5:
-                            st.session_state.search_history = st.session_state.search_history[:5]
-                    
-                except Exception as e:
-                    st.error(f"Error processing your request: {e}")
-                    return
+    # Re-submitting the last query keeps its results instead of searching again
+    last_results = st.session_state.last_results
+    if submitted and user_query.strip() and (not last_results or last_results['query'] != user_query):
+        with st.spinner("🤖 Understanding your request and finding products..."):
+            try:
+                # Parse the query using LLM
+                criteria = llm_handler.parse_query(user_query)
+                
+                # Generate search summary
+                search_summary = llm_handler.generate_search_summary(criteria, user_query)
+                
+                # Filter products
+                filtered_products = product_filter.filter_products(criteria)
+                
+                # Store results in session state, starting on the first page
+                st.session_state.last_results = {
+                    'query': user_query,
+                    'criteria': criteria,
+                    'summary': search_summary,
+                    'products': filtered_products
+                }
+                st.session_state.page = 0
+                
+                # Add to search history, most recent first, keeping the last 5
+                search_history = st.session_state.search_history
+                search_history[user_query] = None
+                search_history.move_to_end(user_query, last=False)
+                while len(search_history) > 5:
+                    search_history.popitem(last=True)
+                
+            except Exception as e:
+                st.error(f"Error processing your request: {e}")
+                return
     
     # Display results
     if st.session_state.last_results:
         results = st.session_state.last_results
         filtered_products = results['products']
         
+        st.markdown(f"""
+        <div class='search-summary'>
+            <strong>🎯 {results['summary']}</strong>
+        </div>
+        """, unsafe_allow_html=True)
+        
         # Generate and display explanation
         explanation = generate_recommendation_explanation(filtered_products, results['criteria'])
         st.markdown(f"""
@@ -219,9 +243,21 @@ def main():
         if len(filtered_products) > 0:
             st.header(f"🎯 Found {len(filtered_products)} Product{'s' if len(filtered_products) != 1 else ''}")
             
-            # Display products
-            for idx, (_, product) in enumerate(filtered_products.iterrows()):
+            # Display the current page of products
+            page_count = (len(filtered_products) - 1) // PAGE_SIZE + 1
+            page = min(st.session_state.page, page_count - 1)
+            start = page * PAGE_SIZE
+            for _, product in filtered_products.iloc[start:start + PAGE_SIZE].iterrows():
                 display_product_card(product)
+            
+            if page_count > 1:
+                prev_col, page_col, next_col = st.columns([1, 2, 1])
+                with prev_col:
+                    st.button("⬅️ Previous", on_click=change_page, args=(-1,), disabled=page == 0)
+                with page_col:
+                    st.markdown(f"Page {page + 1} of {page_count}")
+                with next_col:
+                    st.button("Next ➡️", on_click=change_page, args=(1,), disabled=page == page_count - 1)
                 
             # Show more details in expandable section
             with st.expander("📋 View Detailed Results Table"):
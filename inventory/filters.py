@@ -1,11 +1,80 @@
+import copy
+import functools
+import os
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+import streamlit as st
+from typing import Dict, List, Any, Optional, Tuple
+
+# Explicit column types so read_csv can skip per-column type inference
+PRODUCT_DTYPES = {
+    'name': str,
+    'category': str,
+    'color': str,
+    'price': 'float64',
+    'rating': 'float64',
+    'image_url': str,
+    'description': str,
+}
+
+# Columns matched case-insensitively by substring in filter_products
+TEXT_CRITERIA = ('category', 'color')
+
+# Distinct criteria combinations whose results are memoized per ProductFilter
+FILTER_CACHE_SIZE = 256
+
+# (criteria key, column, comparison) for the numeric predicates
+NUMERIC_CRITERIA = (
+    ('price_max', 'price', np.less_equal),
+    ('price_min', 'price', np.greater_equal),
+    ('rating_min', 'rating', np.greater_equal),
+)
 
 
 class ProductFilter:
     def __init__(self, csv_path: str = "products.csv"):
         """Initialize the ProductFilter with product data from CSV."""
-        self.df = pd.read_csv(csv_path)
+        self.df = pd.read_csv(csv_path, dtype=PRODUCT_DTYPES)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Product data; assigning a new DataFrame rebuilds the lookup columns."""
+        return self._df
+
+    @df.setter
+    def df(self, df: pd.DataFrame) -> None:
+        self._df = df
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Precompute the filter columns as arrays, plus inventory stats."""
+        # Contiguous per-column arrays; filter_products only reads these and
+        # touches the DataFrame once, to take the matching rows
+        self._codes = {}
+        self._values = {}
+        for column in TEXT_CRITERIA:
+            lowered = self._df[column].str.lower().astype('category')
+            self._codes[column] = lowered.cat.codes.to_numpy(dtype=np.int16)
+            self._values[column] = lowered.cat.categories
+        self._numeric = {
+            column: np.ascontiguousarray(self._df[column].to_numpy(dtype=np.float64))
+            for column in ('price', 'rating')
+        }
+        
+        self._stats = {
+            'total_products': len(self._df),
+            'categories': self._df['category'].unique().tolist(),
+            'colors': self._df['color'].unique().tolist(),
+            'price_range': {
+                'min': float(self._df['price'].min()),
+                'max': float(self._df['price'].max()),
+                'avg': float(self._df['price'].mean())
+            },
+            'avg_rating': float(self._df['rating'].mean())
+        }
+        
+        # A fresh result cache per DataFrame, so results never outlive the data
+        self._filter_cached = functools.lru_cache(maxsize=FILTER_CACHE_SIZE)(self._filter_items)
         
     def load_products(self) -> pd.DataFrame:
         """Load and return all products."""
@@ -24,49 +93,82 @@ class ProductFilter:
                      - rating_min: float
                      
         Returns:
-            Filtered DataFrame
+            Filtered DataFrame. Results are memoized per criteria, so the same
+            DataFrame is returned for repeated criteria; treat it as read-only.
         """
-        filtered_df = self.df.copy()
+        items = tuple(sorted(criteria.items()))
+        try:
+            hash(items)
+        except TypeError:
+            # Unhashable criteria values can't be memoized
+            return self._filter_items(items)
+        return self._filter_cached(items)
+    
+    def _filter_items(self, items: Tuple[Tuple[str, Any], ...]) -> pd.DataFrame:
+        """Filter and sort products for criteria given as (key, value) pairs."""
+        criteria = dict(items)
         
-        # Filter by category
-        if criteria.get('category'):
-            category = criteria['category'].lower()
-            filtered_df = filtered_df[filtered_df['category'].str.lower().str.contains(category, na=False)]
+        # Combine every predicate into one boolean mask and slice the frame once
+        mask = np.ones(len(self.df), dtype=bool)
         
-        # Filter by color
-        if criteria.get('color'):
-            color = criteria['color'].lower()
-            filtered_df = filtered_df[filtered_df['color'].str.lower().str.contains(color, na=False)]
+        # Each comparison is written into one scratch buffer instead of
+        # allocating a new array per predicate
+        scratch = np.empty_like(mask)
         
-        # Filter by price range
-        if criteria.get('price_max'):
-            filtered_df = filtered_df[filtered_df['price'] <= criteria['price_max']]
-            
-        if criteria.get('price_min'):
-            filtered_df = filtered_df[filtered_df['price'] >= criteria['price_min']]
+        # Filter by category and color: match the term against the distinct
+        # values once, then gather the result by each row's integer code
+        for column in TEXT_CRITERIA:
+            if criteria.get(column):
+                lut = _code_lookup(self._values[column], criteria[column].lower())
+                np.take(lut, self._codes[column], out=scratch)
+                mask &= scratch
         
-        # Filter by minimum rating
-        if criteria.get('rating_min'):
-            filtered_df = filtered_df[filtered_df['rating'] >= criteria['rating_min']]
+        # Filter by price range and minimum rating
+        for key, column, compare in NUMERIC_CRITERIA:
+            if criteria.get(key):
+                compare(self._numeric[column], criteria[key], out=scratch)
+                mask &= scratch
         
-        # Sort by rating (highest first) and then by price (lowest first)
-        filtered_df = filtered_df.sort_values(['rating', 'price'], ascending=[False, True])
+        # Sort by rating (highest first) and then by price (lowest first);
+        # lexsort treats its last key as the primary one
+        positions = np.flatnonzero(mask)
+        order = np.lexsort((self._numeric['price'][positions],
+                            -self._numeric['rating'][positions]))
         
-        return filtered_df
+        return self.df.iloc[positions[order]]
     
     def get_product_stats(self) -> Dict[str, Any]:
         """Get basic statistics about the product inventory."""
-        return {
-            'total_products': len(self.df),
-            'categories': self.df['category'].unique().tolist(),
-            'colors': self.df['color'].unique().tolist(),
-            'price_range': {
-                'min': self.df['price'].min(),
-                'max': self.df['price'].max(),
-                'avg': self.df['price'].mean()
-            },
-            'avg_rating': self.df['rating'].mean()
-        }
+        # Copied so callers can't modify the stats shared by every session
+        return copy.deepcopy(self._stats)
+
+
+def _code_lookup(values: pd.Index, term: str) -> np.ndarray:
+    """
+    Build a boolean lookup table of which categorical values contain term.
+    
+    The table has one extra trailing False entry, which is what the code -1
+    of a missing value indexes.
+    """
+    lookup = np.zeros(len(values) + 1, dtype=bool)
+    lookup[:-1] = values.str.contains(term)
+    return lookup
+
+
+def get_product_filter(csv_path: str = "products.csv") -> ProductFilter:
+    """
+    Return a ProductFilter shared across Streamlit reruns and sessions.
+    
+    The CSV's modification time is part of the cache key, so editing the file
+    reloads the products and discards any memoized filter results.
+    """
+    return _load_product_filter(csv_path, os.path.getmtime(csv_path))
+
+
+@st.cache_resource(max_entries=1)
+def _load_product_filter(csv_path: str, mtime: float) -> ProductFilter:
+    """Load a ProductFilter; mtime only serves as part of the cache key."""
+    return ProductFilter(csv_path)
 
 
 def generate_recommendation_explanation(filtered_products: pd.DataFrame, 
@@ -104,8 +206,13 @@ def generate_recommendation_explanation(filtered_products: pd.DataFrame,
     if criteria_mentioned:
         explanation_parts.append(" ".join(criteria_mentioned))
     
+    # Pull rating and price out in one block for the quality and price notes
+    ratings_prices = filtered_products[['rating', 'price']].to_numpy(dtype=np.float64)
+    avg_rating = np.nanmean(ratings_prices[:, 0])
+    price_min = np.nanmin(ratings_prices[:, 1])
+    price_max = np.nanmax(ratings_prices[:, 1])
+    
     # Add quality note
-    avg_rating = filtered_products['rating'].mean()
     if avg_rating >= 4.5:
         explanation_parts.append("• All items have excellent ratings")
     elif avg_rating >= 4.0:
@@ -113,7 +220,7 @@ def generate_recommendation_explanation(filtered_products: pd.DataFrame,
     
     # Add price insight
     if len(filtered_products) > 1:
-        price_range = f"${filtered_products['price'].min():.2f} - ${filtered_products['price'].max():.2f}"
+        price_range = f"${price_min:.2f} - ${price_max:.2f}"
         explanation_parts.append(f"• Price range: {price_range}")
     
     return ". ".join(explanation_parts) + "." 
\ No newline at end of file
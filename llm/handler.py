@@ -1,33 +1,113 @@
 import openai
+import streamlit as st
 import json
+import logging
 import os
+import re
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+# Faster JSON decoding when orjson is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-class LLMHandler:
-    def __init__(self):
-        """Initialize the LLM handler with OpenRouter API key."""
-        self.client = openai.OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv('OPENROUTER_API_KEY')
-        )
-        
-    def parse_query(self, user_query: str) -> Dict[str, Any]:
-        """
-        Parse a natural language query into structured criteria.
-        
-        Args:
-            user_query: Natural language query from user
-            
-        Returns:
-            Dictionary with parsed criteria
-        """
-        
-        system_prompt = """
+# Parsed criteria keyed on the normalized query text, shared by every
+# LLMHandler instance in the process and saved to disk so restarts don't
+# start cold. Stored as JSON rather than pickle, which would run arbitrary
+# code from a tampered cache file on load.
+PARSE_CACHE_PATH = os.getenv('PARSE_CACHE_PATH', '.parse_cache.json')
+_PARSE_CACHE_SIZE = 512
+_parse_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def _load_parse_cache() -> None:
+    """Fill the parse cache from PARSE_CACHE_PATH, if it exists."""
+    try:
+        with open(PARSE_CACHE_PATH, 'rb') as f:
+            entries = _json_loads(f.read())
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load parse cache: %s", e)
+        return
+    if not isinstance(entries, dict):
+        return
+    with _parse_cache_lock:
+        # Entries are saved least recently used first
+        for key, criteria in list(entries.items())[-_PARSE_CACHE_SIZE:]:
+            if isinstance(criteria, dict):
+                _parse_cache[key] = criteria
+
+
+def _save_parse_cache() -> None:
+    """Write the parse cache to PARSE_CACHE_PATH; call with the lock held."""
+    tmp_path = PARSE_CACHE_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_parse_cache, f)
+        os.replace(tmp_path, PARSE_CACHE_PATH)
+    except OSError as e:
+        logger.warning("Could not save parse cache: %s", e)
+
+
+_load_parse_cache()
+
+# Keyword tables for _fallback_parse, in priority order
+FALLBACK_COLORS = ['red', 'blue', 'green', 'black', 'white', 'pink', 'yellow', 'purple', 'orange', 'brown', 'grey', 'gray', 'navy']
+FALLBACK_CATEGORIES = {
+    'dress': ['dress', 'gown'],
+    'jeans': ['jeans', 'denim'],
+    'shirt': ['shirt', 'blouse', 'top'],
+    'shoes': ['shoes', 'sneakers', 'boots'],
+    'jacket': ['jacket', 'blazer', 'coat']
+}
+
+# Precompiled so each fallback parse is a single scan per keyword table
+_CATEGORY_BY_KEYWORD = {keyword: category
+                        for category, keywords in FALLBACK_CATEGORIES.items()
+                        for keyword in keywords}
+_CATEGORY_ORDER = list(FALLBACK_CATEGORIES)
+_COLOR_RE = re.compile("|".join(map(re.escape, FALLBACK_COLORS)))
+_CATEGORY_RE = re.compile("|".join(map(re.escape, _CATEGORY_BY_KEYWORD)))
+_PRICE_RE = re.compile(r'\$?(\d+)')
+
+# Short queries whose keywords are unambiguous skip the LLM call. Ratings,
+# negations and price ranges are left to the LLM, since keyword matching
+# would misread them (e.g. "rated 4" as a price), and so are price and
+# quality words ("cheap", "best") that SYSTEM_PROMPT turns into criteria
+FAST_PATH_MIN_FIELDS = 2
+FAST_PATH_MAX_WORDS = 8
+_FAST_PATH_BLOCKER_RE = re.compile(
+    r'\b(?:not|no|without|except|between|rating|ratings|rated|stars?|reviews?'
+    r'|cheap|affordable|inexpensive|budget|expensive|luxury|premium'
+    r'|best|good|quality)\b|\d\D+\d')
+
+# Stricter than the fallback patterns: whole words only (optionally plural),
+# and a number only counts as a price when marked by "$" or a direction word,
+# so "tailored" is not red and "size 9" is not a price
+_FAST_COLOR_RE = re.compile(
+    r'\b(' + "|".join(map(re.escape, FALLBACK_COLORS)) + r')(?:e?s)?\b')
+_FAST_CATEGORY_RE = re.compile(
+    r'\b(' + "|".join(map(re.escape, _CATEGORY_BY_KEYWORD)) + r')(?:e?s)?\b')
+_FAST_PRICE_RE = re.compile(
+    r'(?:\b(under|below|less than|over|above|more than)\s+)?(\$)?(\d+)\b')
+_PRICE_MIN_WORDS = ('over', 'above', 'more than')
+
+
+# Sent first and byte-identical on every parse request, so the request prefix
+# stays stable for provider-side prompt caching
+SYSTEM_PROMPT = """
 You are a helpful assistant that parses shopping queries into structured data.
 
 Extract the following information from the user's query and return it as a JSON object:
@@ -53,35 +133,207 @@ Examples:
 Return only the JSON object, no other text.
 """
 
-        try:
-            response = self.client.chat.completions.create(
-                model="openai/gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_query}
-                ],
-                max_tokens=200,
-                temperature=0.1
-            )
+
+def _normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+class _JsonObjectScanner:
+    """Find the end of the first JSON object in text that arrives in pieces."""
+
+    def __init__(self):
+        self._text = ""
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> Optional[str]:
+        """
+        Add the next piece of text.
+        
+        Returns:
+            The complete object text once its closing brace is seen, else None
+        """
+        offset = len(self._text)
+        self._text += piece
+        for i in range(offset, len(self._text)):
+            char = self._text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '{':
+                if self._start is None:
+                    self._start = i
+                self._depth += 1
+            elif self._start is None:
+                # Skip any text before the object starts
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._text[self._start:i + 1]
+        return None
+
+
+class LLMHandler:
+    def __init__(self):
+        """Initialize the LLM handler with OpenRouter API key."""
+        self.client = openai.OpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=os.getenv('OPENROUTER_API_KEY'),
+            timeout=10,
+            max_retries=1
+        )
+        
+    def parse_query(self, user_query: str) -> Dict[str, Any]:
+        """
+        Parse a natural language query into structured criteria.
+        
+        Args:
+            user_query: Natural language query from user
+            
+        Returns:
+            Dictionary with parsed criteria
+        """
+        cache_key = _normalize_query(user_query)
+        with _parse_cache_lock:
+            cached = _parse_cache.get(cache_key)
+            if cached is not None:
+                _parse_cache.move_to_end(cache_key)
+                return dict(cached)
+
+        fast_criteria = self._fast_parse(user_query)
+        if fast_criteria is not None:
+            logger.debug("Parsed %r with keyword fast path: %s", user_query, fast_criteria)
+            return fast_criteria
+
+        logger.debug("Parsing %r with LLM", user_query)
+        criteria = self._parse_query_llm(user_query)
+        if criteria is not None:
+            with _parse_cache_lock:
+                _parse_cache[cache_key] = criteria
+                if len(_parse_cache) > _PARSE_CACHE_SIZE:
+                    _parse_cache.popitem(last=False)
+                _save_parse_cache()
+            return dict(criteria)
+
+        # Fallback to simple keyword parsing
+        return self._fallback_parse(user_query)
+
+    def _fast_parse(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a query with keyword matching alone when that is reliable.
+        
+        Args:
+            user_query: Natural language query from user
+            
+        Returns:
+            Dictionary with parsed criteria, or None if the LLM is needed
+        """
+        query_lower = user_query.lower()
+        if len(query_lower.split()) > FAST_PATH_MAX_WORDS:
+            return None
+        if _FAST_PATH_BLOCKER_RE.search(query_lower):
+            return None
+        criteria = {}
+        
+        colors = set(_FAST_COLOR_RE.findall(query_lower))
+        if len(colors) > 1:
+            return None
+        if colors:
+            criteria['color'] = colors.pop()
+        
+        # Synonyms such as "blazer" or "blouse" are categories of their own in
+        # the catalog, so only a keyword that names a category is trusted. A
+        # category is required, since an unknown product noun ("skirt") would
+        # otherwise be dropped silently
+        keywords = set(_FAST_CATEGORY_RE.findall(query_lower))
+        if len(keywords) != 1 or not keywords <= FALLBACK_CATEGORIES.keys():
+            return None
+        criteria['category'] = keywords.pop()
+        
+        price_match = _FAST_PRICE_RE.search(query_lower)
+        if price_match:
+            direction, dollar, amount = price_match.groups()
+            if not direction and not dollar:
+                return None
+            key = 'price_min' if direction in _PRICE_MIN_WORDS else 'price_max'
+            criteria[key] = float(amount)
+        
+        return criteria if len(criteria) >= FAST_PATH_MIN_FIELDS else None
+
+    def _parse_query_llm(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Ask the LLM to parse a query into structured criteria.
+        
+        Args:
+            user_query: Natural language query from user
             
-            result_text = response.choices[0].message.content.strip()
+        Returns:
+            Dictionary with parsed criteria, or None if the API call failed
+        """
+        request = dict(
+            model="openai/gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_query}
+            ],
+            # JSON mode guarantees a single well-formed object, which also
+            # bounds the reply to a few dozen tokens
+            response_format={"type": "json_object"},
+            max_tokens=80,
+            temperature=0.1
+        )
+
+        try:
+            result_text = self._stream_json_object(request)
+            if result_text is None:
+                # A repeat of the same request would be cut off the same way
+                logger.warning("OpenRouter response ended without a complete JSON object")
+                return None
             
-            # Try to parse the JSON response
-            try:
-                criteria = json.loads(result_text)
-                return criteria if isinstance(criteria, dict) else {}
-            except json.JSONDecodeError:
-                # Fallback: try to extract JSON from the response
-                import re
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group())
-                return {}
+            criteria = _json_loads(result_text)
+            return criteria if isinstance(criteria, dict) else {}
                 
         except Exception as e:
-            print(f"Error calling OpenRouter API: {e}")
-            # Fallback to simple keyword parsing
-            return self._fallback_parse(user_query)
+            logger.warning("Error calling OpenRouter API: %s", e)
+            return None
+    
+    def _stream_json_object(self, request: Dict[str, Any]) -> Optional[str]:
+        """
+        Stream a completion and return the first JSON object in it.
+        
+        The stream is closed as soon as the object's closing brace arrives,
+        so the remaining tokens of the completion are never waited for.
+        
+        Args:
+            request: Keyword arguments for chat.completions.create
+            
+        Returns:
+            The JSON object text, or None if the stream ended before it closed
+        """
+        scanner = _JsonObjectScanner()
+        stream = self.client.chat.completions.create(**request, stream=True)
+        try:
+            for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                result_text = scanner.feed(chunk.choices[0].delta.content)
+                if result_text is not None:
+                    return result_text
+            return None
+        finally:
+            # Close the underlying HTTP response; Stream.close() only exists
+            # in newer openai releases than requirements.txt allows
+            stream.response.close()
     
     def _fallback_parse(self, query: str) -> Dict[str, Any]:
         """
@@ -96,30 +348,19 @@ Return only the JSON object, no other text.
         query_lower = query.lower()
         criteria = {}
         
-        # Simple color detection
-        colors = ['red', 'blue', 'green', 'black', 'white', 'pink', 'yellow', 'purple', 'orange', 'brown', 'grey', 'gray', 'navy']
-        for color in colors:
-            if color in query_lower:
-                criteria['color'] = color
-                break
-        
-        # Simple category detection
-        categories = {
-            'dress': ['dress', 'gown'],
-            'jeans': ['jeans', 'denim'],
-            'shirt': ['shirt', 'blouse', 'top'],
-            'shoes': ['shoes', 'sneakers', 'boots'],
-            'jacket': ['jacket', 'blazer', 'coat']
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in query_lower for keyword in keywords):
-                criteria['category'] = category
-                break
+        # Simple color detection; the earliest color in the table wins
+        colors = {match.group() for match in _COLOR_RE.finditer(query_lower)}
+        if colors:
+            criteria['color'] = min(colors, key=FALLBACK_COLORS.index)
+        
+        # Simple category detection; the earliest category in the table wins
+        categories = {_CATEGORY_BY_KEYWORD[match.group()]
+                      for match in _CATEGORY_RE.finditer(query_lower)}
+        if categories:
+            criteria['category'] = min(categories, key=_CATEGORY_ORDER.index)
         
         # Simple price detection
-        import re
-        price_match = re.search(r'\$?(\d+)', query)
+        price_match = _PRICE_RE.search(query)
         if price_match:
             price = float(price_match.group(1))
             if 'under' in query_lower or 'below' in query_lower or 'less than' in query_lower:
@@ -157,4 +398,10 @@ Return only the JSON object, no other text.
         if criteria.get('rating_min'):
             parts.append(f"Min rating: {criteria['rating_min']}")
         
-        return "Searching for: " + " | ".join(parts) 
\ No newline at end of file
+        return "Searching for: " + " | ".join(parts)
+
+
+@st.cache_resource
+def get_llm_handler() -> LLMHandler:
+    """Return an LLMHandler whose client and connection pool are reused across reruns."""
+    return LLMHandler()
@@ -42,6 +42,14 @@ class TestProductFilter(unittest.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result.iloc[0]['name'], 'Blue Jeans')
     
+    def test_filter_text_is_case_insensitive_substring(self):
+        """Test category/color matching ignores case and matches substrings."""
+        result = self.filter.filter_products({'category': 'DRESS'})
+        self.assertEqual(list(result['name']), ['Red Dress'])
+        
+        result = self.filter.filter_products({'color': 'bl'})
+        self.assertEqual(len(result), 2)  # Blue Jeans and Black Jacket
+    
     def test_filter_by_price_max(self):
         """Test filtering by maximum price."""
         criteria = {'price_max': 200.0}
@@ -78,6 +86,26 @@ class TestProductFilter(unittest.TestCase):
         result = self.filter.filter_products(criteria)
         self.assertEqual(len(result), 0)
     
+    def test_results_sorted_by_rating_then_price(self):
+        """Test results are ordered by rating (desc), then price (asc)."""
+        self.filter.df = pd.concat([self.test_data, pd.DataFrame({
+            'name': ['Cheap Jacket'], 'category': ['jacket'], 'color': ['black'],
+            'price': [99.0], 'rating': [4.8], 'image_url': ['url4'],
+            'description': ['desc4']
+        })], ignore_index=True)
+        result = self.filter.filter_products({})
+        self.assertEqual(list(result['name']),
+                         ['Cheap Jacket', 'Black Jacket', 'Red Dress', 'Blue Jeans'])
+    
+    def test_filter_results_are_memoized(self):
+        """Test repeated criteria reuse results until the data changes."""
+        first = self.filter.filter_products({'color': 'blue', 'price_max': 100.0})
+        self.assertIs(self.filter.filter_products({'price_max': 100.0, 'color': 'blue'}), first)
+        
+        self.filter.df = self.test_data.iloc[:1]
+        result = self.filter.filter_products({'color': 'blue', 'price_max': 100.0})
+        self.assertEqual(len(result), 0)
+    
     def test_get_product_stats(self):
         """Test getting product statistics."""
         stats = self.filter.get_product_stats()
@@ -0,0 +1,187 @@
+import unittest
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The OpenAI client refuses to construct without a key; no request is sent
+os.environ.setdefault('OPENROUTER_API_KEY', 'test-key')
+
+from llm import handler as handler_module
+from llm.handler import LLMHandler, _JsonObjectScanner
+
+
+def make_chunk(content):
+    """Build a minimal streamed chat-completion chunk."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeStream:
+    """Only the parts of openai 1.3.0's Stream that the handler may use."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.response = mock.Mock(spec=['close'])
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class TestFallbackParse(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the handler under test."""
+        self.handler = LLMHandler()
+
+    def test_color_and_category(self):
+        """Test detecting a color and a category keyword."""
+        criteria = self.handler._fallback_parse("Show me a Red gown")
+        self.assertEqual(criteria, {'color': 'red', 'category': 'dress'})
+
+    def test_earliest_table_entry_wins(self):
+        """Test that table order, not query order, decides between matches."""
+        criteria = self.handler._fallback_parse("blue top or red dress")
+        self.assertEqual(criteria['color'], 'red')
+        self.assertEqual(criteria['category'], 'dress')
+
+    def test_price_direction(self):
+        """Test price keywords map to the right bound."""
+        self.assertEqual(self.handler._fallback_parse("jeans under $80"),
+                         {'category': 'jeans', 'price_max': 80.0})
+        self.assertEqual(self.handler._fallback_parse("boots over 100"),
+                         {'category': 'shoes', 'price_min': 100.0})
+
+    def test_no_criteria(self):
+        """Test a query with no recognizable keywords."""
+        self.assertEqual(self.handler._fallback_parse("something nice"), {})
+
+
+class TestJsonObjectScanner(unittest.TestCase):
+
+    def test_object_split_across_pieces(self):
+        """Test the object is returned once its closing brace arrives."""
+        scanner = _JsonObjectScanner()
+        self.assertIsNone(scanner.feed('Sure: {"color": '))
+        self.assertIsNone(scanner.feed('"red", "x": {"y": 1}'))
+        self.assertEqual(scanner.feed('} trailing'), '{"color": "red", "x": {"y": 1}}')
+
+    def test_braces_inside_strings_are_ignored(self):
+        """Test braces and escaped quotes inside strings don't end the object."""
+        scanner = _JsonObjectScanner()
+        self.assertEqual(scanner.feed('{"a": "}\\"{"}'), '{"a": "}\\"{"}')
+
+
+class TestParseQuery(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a handler with a fake streaming client."""
+        handler_module._parse_cache.clear()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_path = os.path.join(tmp_dir.name, 'parse_cache.json')
+        patcher = mock.patch.object(handler_module, 'PARSE_CACHE_PATH', self.cache_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.handler = LLMHandler()
+        self.stream = mock.MagicMock()
+        self.stream.__iter__.return_value = iter([
+            make_chunk('{"category": "dress", '),
+            make_chunk('"color": "red"}'),
+            make_chunk('ignored'),
+        ])
+        self.create = mock.Mock(return_value=self.stream)
+        self.handler.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self.create)))
+
+    def test_streamed_response_is_parsed_and_closed(self):
+        """Test the criteria are parsed from the stream and the stream closed."""
+        criteria = self.handler.parse_query("Something   for a Wedding")
+        self.assertEqual(criteria, {'category': 'dress', 'color': 'red'})
+        self.assertTrue(self.create.call_args.kwargs['stream'])
+        self.assertEqual(self.create.call_args.kwargs['response_format'], {'type': 'json_object'})
+        self.stream.response.close.assert_called_once()
+
+    def test_minimal_stream_is_parsed_and_closed(self):
+        """Test a stream without Stream.close() (openai 1.3.0) still parses."""
+        stream = FakeStream([make_chunk('{"color": "blue"}')])
+        self.create.return_value = stream
+        criteria = self.handler.parse_query("Something   for a Wedding")
+        self.assertEqual(criteria, {'color': 'blue'})
+        stream.response.close.assert_called_once()
+
+    def test_truncated_stream_falls_back_without_retry(self):
+        """Test an incomplete object uses the keyword parser and isn't retried."""
+        self.create.return_value = FakeStream([make_chunk('{"color": "bl')])
+        criteria = self.handler.parse_query("something blue for a wedding")
+        self.assertEqual(criteria, {'color': 'blue'})
+        self.create.assert_called_once()
+        self.assertEqual(len(handler_module._parse_cache), 0)
+
+    def test_repeated_query_is_cached(self):
+        """Test a normalized repeat of a query doesn't call the API again."""
+        self.handler.parse_query("Something   for a Wedding")
+        criteria = self.handler.parse_query("something for a wedding")
+        self.assertEqual(criteria, {'category': 'dress', 'color': 'red'})
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_cache_persists_across_restarts(self):
+        """Test parsed criteria are saved to disk and loaded back."""
+        self.handler.parse_query("Something   for a Wedding")
+        self.assertTrue(os.path.exists(self.cache_path))
+        
+        handler_module._parse_cache.clear()
+        handler_module._load_parse_cache()
+        criteria = self.handler.parse_query("something for a wedding")
+        self.assertEqual(criteria, {'category': 'dress', 'color': 'red'})
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_simple_query_skips_llm(self):
+        """Test a short query fully covered by keywords doesn't call the API."""
+        criteria = self.handler.parse_query("red dress under $50")
+        self.assertEqual(criteria, {'color': 'red', 'category': 'dress', 'price_max': 50.0})
+        self.create.assert_not_called()
+
+    def test_plural_and_min_price_skip_llm(self):
+        """Test plural keywords and direction words on the fast path."""
+        criteria = self.handler.parse_query("black jackets over 100")
+        self.assertEqual(criteria, {'color': 'black', 'category': 'jacket', 'price_min': 100.0})
+        self.create.assert_not_called()
+
+    def test_keyword_inside_word_uses_llm(self):
+        """Test a color inside another word ("tailored") isn't matched."""
+        self.handler.parse_query("tailored black blazer")
+        self.create.assert_called_once()
+        self.assertEqual(self.handler._fast_parse("tailored shoes under $80"),
+                         {'category': 'shoes', 'price_max': 80.0})
+
+    def test_bare_number_uses_llm(self):
+        """Test a number without "$" or a direction word isn't read as a price."""
+        self.handler.parse_query("black shoes size 9")
+        self.create.assert_called_once()
+
+    def test_synonym_category_uses_llm(self):
+        """Test synonyms that are catalog categories of their own go to the LLM."""
+        self.handler.parse_query("black blazer under $300")
+        self.create.assert_called_once()
+        self.assertIsNone(self.handler._fast_parse("white blouse under $100"))
+
+    def test_price_and_quality_words_use_llm(self):
+        """Test qualifiers the LLM turns into criteria aren't dropped."""
+        self.handler.parse_query("cheap red dress")
+        self.create.assert_called_once()
+        for query in ["affordable black jacket", "expensive red dress",
+                      "best red dress", "high quality red dress"]:
+            self.assertIsNone(self.handler._fast_parse(query), query)
+
+    def test_rating_query_uses_llm(self):
+        """Test queries the keyword parser would misread still go to the LLM."""
+        self.handler.parse_query("red dress rated 4 stars")
+        self.create.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()